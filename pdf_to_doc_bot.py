@@ -5,22 +5,35 @@ Converts PDF files to Microsoft Word DOC format (97-2003)
 """
 
 import os
+import asyncio
 import logging
 import tempfile
 import shutil
+import hashlib
+import io
+import re
+import zipfile
 from pathlib import Path
+from xml.sax.saxutils import escape
 from telegram import Update
+from telegram.constants import ParseMode
 from telegram.ext import Application, CommandHandler, MessageHandler, ContextTypes, filters
 import subprocess
 import platform
+import multiprocessing
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
-# For PDF text extraction
-import PyPDF2
-from pdfplumber import PDF
-import python_docx
-from docx import Document
-from docx.shared import Pt, RGBColor, Inches
-from docx.enum.text import WD_ALIGN_PARAGRAPH
+# PDF and Word libraries are imported where they are used so the bot
+# and idle worker processes start without loading them
+
+# Optional: persistent LibreOffice for DOCX to DOC conversion
+try:
+    from unoserver.client import UnoClient
+except ImportError:
+    UnoClient = None
 
 # Enable logging
 logging.basicConfig(
@@ -29,6 +42,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# pdfminer logs every token at DEBUG, which dominates runtime if propagated
+logging.getLogger("pdfminer").setLevel(logging.ERROR)
+logging.getLogger("pdfplumber").setLevel(logging.WARNING)
+
 # Your Telegram Bot Token (Get from @BotFather)
 BOT_TOKEN = os.environ.get('BOT_TOKEN')
 
@@ -38,40 +55,489 @@ if not BOT_TOKEN:
 # Maximum file size (20MB)
 MAX_FILE_SIZE = 20 * 1024 * 1024
 
+# Process pool for conversions (created in main), shared by all page extraction work
+CONVERT_POOL = None
+CONVERT_WORKERS = os.cpu_count() or 1
+
+# Split PDFs with at least this many pages across the pool's workers
+PARALLEL_PAGE_THRESHOLD = 8
+
+# Convert to legacy binary DOC with LibreOffice (slow) instead of saving DOCX content as .doc
+USE_LEGACY_DOC = os.environ.get('USE_LEGACY_DOC', '0') == '1'
+
+# LibreOffice executable, looked up once at startup
+LIBREOFFICE_CMD = shutil.which('libreoffice') or shutil.which('soffice')
+
+# Converted files are cached by PDF content hash
+CACHE_DIR = Path(os.environ.get('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'pdf_to_doc_cache')))
+CACHE_MAX_SIZE = int(os.environ.get('CACHE_MAX_SIZE', 2 * 1024 * 1024 * 1024))
+CACHE_MAX_AGE = int(os.environ.get('CACHE_MAX_AGE', 24 * 60 * 60))  # seconds, 0 disables the cache
+
+# Bump whenever conversion output changes so stale cache entries are not served
+CONVERTER_VERSION = 2
+
+# Ports used by the persistent LibreOffice server
+UNO_PORT = 2002
+UNOSERVER_PORT = 2003
+
+# Pages with less text than this and a larger content stream are treated as figures
+FIGURE_PAGE_MAX_TEXT = 100
+FIGURE_PAGE_MIN_STREAM = 500_000
+
+# pdfplumber equivalent: few characters and many vector shapes
+FIGURE_PAGE_MAX_CHARS = 20
+FIGURE_PAGE_MIN_SHAPES = 1000
+
+# Consecutive pages extracted between MuPDF cache flushes, reusing warm font/resource caches
+PAGE_TILE_SIZE = 32
+
+# Looser pdfplumber table settings: less edge clustering work, good enough for Word output
+PDFPLUMBER_TABLE_SETTINGS = {
+    'snap_tolerance': 5,
+    'join_tolerance': 5,
+    'edge_min_length': 8,
+}
+
+def _figure_page(page_num):
+    """Placeholder for a graphics-only page"""
+    logger.info(f"Skipping graphics-heavy page {page_num}")
+    return {
+        'page': page_num,
+        'text': f"[Page {page_num}: figures omitted]",
+        'tables': []
+    }
+
+def _extract_page(page, page_num):
+    """Extract text and tables from a single PyMuPDF page"""
+    page_text = page.get_text("text")
+    stripped_text = page_text.strip()
+    
+    # Don't run table detection over large drawing streams that yield almost no text
+    # (checked before the empty-page test so figure-only pages still get a placeholder)
+    if len(stripped_text) < FIGURE_PAGE_MAX_TEXT and len(page.read_contents()) > FIGURE_PAGE_MIN_STREAM:
+        return _figure_page(page_num)
+    
+    if not stripped_text:
+        return None
+    
+    # Table detection needs vector lines, so skip it on pages without drawings.
+    # get_cdrawings is the cheap C-level probe; get_drawings would extract every
+    # path a second time, since find_tables already does that itself
+    if page.get_cdrawings():
+        tables = [table.extract() for table in page.find_tables().tables]
+    else:
+        tables = []
+    
+    return {
+        'page': page_num,
+        'text': page_text,
+        'tables': tables
+    }
+
+def _extract_page_tile(pdf, start, stop):
+    """Extract a run of consecutive pages from an open PyMuPDF document"""
+    import fitz  # PyMuPDF
+    
+    pages = [_extract_page(pdf.load_page(i), i + 1) for i in range(start, stop)]
+    
+    # Fonts and images stay cached across the tile; release them before the next one
+    fitz.TOOLS.store_shrink(100)
+    return pages
+
+class LibreOfficeServer:
+    """Keep a headless LibreOffice running so conversions skip its startup"""
+    
+    # A server that keeps exiting is restarted at most this many times, waiting
+    # RESTART_BACKOFF seconds (doubled after each restart) before each attempt
+    MAX_RESTARTS = 5
+    RESTART_BACKOFF = 5
+    
+    def __init__(self):
+        self.process = None
+        self.restarts = 0
+        self.exited_at = None
+    
+    @staticmethod
+    def is_accepting():
+        """Return True if unoserver is accepting XML-RPC connections"""
+        try:
+            with socket.create_connection(('127.0.0.1', UNOSERVER_PORT), timeout=1):
+                return True
+        except OSError:
+            return False
+    
+    def start(self):
+        """Launch unoserver (which owns the soffice process)"""
+        cmd = shutil.which('unoserver')
+        if not cmd:
+            logger.info("unoserver not found, LibreOffice will be started per conversion")
+            return
+        
+        self.process = subprocess.Popen([
+            cmd, '--port', str(UNOSERVER_PORT), '--uno-port', str(UNO_PORT)
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.exited_at = None
+        logger.info(f"Started LibreOffice server (pid {self.process.pid})")
+    
+    def ensure_running(self):
+        """Restart the server with backoff if it has exited"""
+        if self.process is None:
+            return
+        
+        if self.process.poll() is None:
+            # Accepting connections again, so earlier crashes are forgiven
+            if self.restarts and self.is_accepting():
+                self.restarts = 0
+            return
+        
+        now = time.monotonic()
+        if self.exited_at is None:
+            self.exited_at = now
+            logger.warning(f"LibreOffice server exited with code {self.process.returncode}")
+            if self.restarts >= self.MAX_RESTARTS:
+                logger.error(
+                    "LibreOffice server keeps exiting, giving up; unoserver must run "
+                    "under LibreOffice's Python (with the uno module)"
+                )
+                self.process = None
+                return
+        
+        if now - self.exited_at < self.RESTART_BACKOFF * 2 ** self.restarts:
+            return
+        
+        self.restarts += 1
+        logger.warning(f"Restarting LibreOffice server (attempt {self.restarts}/{self.MAX_RESTARTS})")
+        self.start()
+    
+    def stop(self):
+        """Shut the server down"""
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+LIBREOFFICE_SERVER = LibreOfficeServer()
+
+class ConversionCache:
+    """On-disk LRU cache of converted DOC files keyed by PDF SHA-256
+    
+    Entries expire max_age seconds after they were written (mtime); recency
+    of use is tracked separately in atime so a hit never extends the expiry.
+    """
+    
+    # Temporary files older than this are leftovers from an interrupted put()
+    STALE_TEMP_AGE = 10 * 60
+    
+    def __init__(self, cache_dir, max_size, max_age):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.max_age = max_age
+        self.cache_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+        
+        # Legacy binary DOC and DOCX-as-.doc output are cached separately
+        self.extension = 'doc' if USE_LEGACY_DOC else 'docx'
+    
+    @property
+    def enabled(self):
+        return self.max_age > 0
+    
+    def _path(self, key):
+        return self.cache_dir / f"{key}-v{CONVERTER_VERSION}.{self.extension}"
+    
+    def get(self, key):
+        """Return the cached DOC bytes, or None on a miss"""
+        if not self.enabled:
+            return None
+        
+        cached_path = self._path(key)
+        try:
+            written_at = cached_path.stat().st_mtime
+            if time.time() - written_at > self.max_age:
+                cached_path.unlink(missing_ok=True)
+                return None
+            
+            doc_bytes = cached_path.read_bytes()
+            os.utime(cached_path, (time.time(), written_at))  # Mark as recently used
+            return doc_bytes
+        except FileNotFoundError:
+            return None
+    
+    def put(self, key, doc_bytes):
+        """Store converted DOC bytes and evict expired and least recently used entries"""
+        if not self.enabled:
+            return
+        
+        try:
+            # Write to a temporary file and rename it into place so readers
+            # never see a partially written entry
+            with tempfile.NamedTemporaryFile(dir=self.cache_dir, suffix='.tmp', delete=False) as temp_file:
+                temp_file.write(doc_bytes)
+            try:
+                os.replace(temp_file.name, self._path(key))
+            except OSError:
+                os.remove(temp_file.name)
+                raise
+            self.evict()
+        except OSError as e:
+            logger.warning(f"Failed to cache converted file: {e}")
+    
+    def evict(self):
+        """Delete expired entries, then the least recently used until the cache fits in max_size"""
+        now = time.time()
+        entries = []
+        total_size = 0
+        for pattern in ('*.doc', '*.docx', '*.tmp'):
+            for entry in self.cache_dir.glob(pattern):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                
+                is_temp = entry.suffix == '.tmp'
+                max_age = self.STALE_TEMP_AGE if is_temp else self.max_age
+                if now - stat.st_mtime > max_age:
+                    entry.unlink(missing_ok=True)
+                    continue
+                
+                total_size += stat.st_size
+                # In-progress temporary files count toward the size but are never evicted
+                if not is_temp:
+                    entries.append((stat.st_atime, stat.st_size, entry))
+        
+        for _, size, entry in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            entry.unlink(missing_ok=True)
+            total_size -= size
+
+CONVERSION_CACHE = ConversionCache(CACHE_DIR, CACHE_MAX_SIZE, CACHE_MAX_AGE)
+
+# Characters that are not allowed in XML 1.0 documents
+_INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+# Run properties for the grey "Page N" header (10pt bold)
+_PAGE_HEADER_RUN_PROPERTIES = '<w:rPr><w:b/><w:color w:val="808080"/><w:sz w:val="20"/></w:rPr>'
+
+def _clean_paragraphs(text):
+    """Split text into stripped, non-empty paragraphs
+    
+    split, map(str.strip) and filter(None) all loop in C, so there is no
+    per-paragraph bytecode and each paragraph is stripped only once.
+    """
+    return list(filter(None, map(str.strip, text.split('\n\n'))))
+
+class StreamingDocxWriter:
+    """Write a DOCX package, streaming word/document.xml one block at a time
+    
+    Blocks are serialized to XML strings and compressed as they are added,
+    so no python-docx/lxml element tree is built for the document. The
+    remaining package parts (styles, settings, ...) come from the
+    python-docx default template.
+    """
+    
+    # Twips available between the template's page margins
+    TEXT_WIDTH = 8640
+    
+    # zlib level 1 is several times faster than the default 6 and only
+    # slightly larger for text-heavy documents
+    COMPRESS_LEVEL = 1
+    
+    _template = None
+    
+    def __init__(self, fileobj):
+        parts, self._prefix, self._suffix = self._load_template()
+        
+        # Serialized runs for cell values already seen in this document
+        self._cell_runs = {}
+        
+        self._zip = zipfile.ZipFile(
+            fileobj, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=self.COMPRESS_LEVEL
+        )
+        # Template parts are small and fixed, so compress them fully
+        for name, data in parts.items():
+            self._zip.writestr(name, data, compresslevel=9)
+        
+        self._document = self._zip.open('word/document.xml', 'w')
+        self._document.write(self._prefix)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    @classmethod
+    def _load_template(cls):
+        """Read the template parts once per process"""
+        if cls._template is None:
+            import docx
+            
+            template_path = os.path.join(os.path.dirname(docx.__file__), 'templates', 'default.docx')
+            with zipfile.ZipFile(template_path) as template:
+                parts = {name: template.read(name) for name in template.namelist()}
+            
+            document_xml = parts.pop('word/document.xml')
+            body_start = document_xml.index(b'<w:body>') + len(b'<w:body>')
+            cls._template = (
+                parts,
+                document_xml[:body_start],
+                document_xml[document_xml.index(b'<w:sectPr'):]
+            )
+        return cls._template
+    
+    @staticmethod
+    def _run(text, properties=''):
+        """Serialize text as a run, turning tabs and line breaks into Word markup"""
+        content = []
+        for piece in re.split('([\t\n\r])', _INVALID_XML_CHARS.sub('', text)):
+            if piece == '\t':
+                content.append('<w:tab/>')
+            elif piece in ('\n', '\r'):
+                content.append('<w:br/>')
+            elif piece:
+                content.append(f'<w:t xml:space="preserve">{escape(piece)}</w:t>')
+        return f'<w:r>{properties}{"".join(content)}</w:r>'
+    
+    def _cell_run(self, cell):
+        """Serialize a table cell value, reusing the XML for repeated values"""
+        text = str(cell)
+        run = self._cell_runs.get(text)
+        if run is None:
+            run = self._cell_runs[text] = self._run(text)
+        return run
+    
+    def _write(self, xml):
+        self._document.write(xml.encode('utf-8', 'replace'))
+    
+    def add_title(self, text):
+        """Add a paragraph in the Title style"""
+        self._write(f'<w:p><w:pPr><w:pStyle w:val="Title"/></w:pPr>{self._run(text)}</w:p>')
+    
+    def add_paragraph(self, text='', alignment=None, run_properties=''):
+        """Add a paragraph; alignment is a w:jc value such as 'center' or 'both'"""
+        properties = f'<w:pPr><w:jc w:val="{alignment}"/></w:pPr>' if alignment else ''
+        runs = self._run(text, run_properties) if text else ''
+        self._write(f'<w:p>{properties}{runs}</w:p>')
+    
+    def add_page_break(self):
+        """Add a paragraph holding a page break"""
+        self._write('<w:p><w:r><w:br w:type="page"/></w:r></w:p>')
+    
+    def add_table(self, rows):
+        """Add a Table Grid table sized to the first row"""
+        cols = len(rows[0])
+        width = self.TEXT_WIDTH // cols
+        grid_col = f'<w:gridCol w:w="{width}"/>'
+        cell_start = f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{width}"/></w:tcPr><w:p>'
+        
+        self._write(
+            '<w:tbl><w:tblPr><w:tblStyle w:val="TableGrid"/><w:tblW w:type="auto" w:w="0"/>'
+            '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" '
+            'w:noHBand="0" w:noVBand="1" w:val="04A0"/></w:tblPr>'
+            f'<w:tblGrid>{grid_col * cols}</w:tblGrid>'
+        )
+        for row in rows:
+            cells = list(row[:cols]) + [None] * (cols - len(row))
+            self._write('<w:tr>' + ''.join(
+                f'{cell_start}{self._cell_run(cell) if cell else ""}</w:p></w:tc>'
+                for cell in cells
+            ) + '</w:tr>')
+        self._write('</w:tbl>')
+    
+    def close(self):
+        """Finish document.xml and the ZIP archive"""
+        if self._document:
+            self._document.write(self._suffix)
+            self._document.close()
+            self._document = None
+            self._zip.close()
+
 class PDFToDocConverter:
     """Handle PDF to DOC conversion"""
     
     @staticmethod
-    def extract_text_from_pdf(pdf_path):
-        """Extract text content from PDF"""
+    def count_pages(pdf_bytes):
+        """Return the number of pages in a PDF"""
+        import fitz  # PyMuPDF
+        
+        with fitz.open(stream=pdf_bytes, filetype='pdf') as pdf:
+            return pdf.page_count
+    
+    @staticmethod
+    def extract_page_range(pdf_bytes, start, stop):
+        """Extract pages [start, stop) with PyMuPDF, one share of a parallel extraction"""
+        import fitz  # PyMuPDF
+        
+        pages = []
+        with fitz.open(stream=pdf_bytes, filetype='pdf') as pdf:
+            for tile_start in range(start, stop, PAGE_TILE_SIZE):
+                pages.extend(_extract_page_tile(pdf, tile_start, min(tile_start + PAGE_TILE_SIZE, stop)))
+        return pages
+    
+    @staticmethod
+    def extract_text_from_pdf(pdf_bytes):
+        """Extract text content from PDF bytes"""
         text_content = []
         
         try:
-            # Try with pdfplumber first (better formatting preservation)
-            with PDF.open(pdf_path) as pdf:
+            # Try with PyMuPDF first (fast C-based MuPDF parser)
+            import fitz
+            
+            # Pages are extracted serially here; convert_in_pool splits large
+            # PDFs into page ranges across CONVERT_POOL instead
+            pages = []
+            with fitz.open(stream=pdf_bytes, filetype='pdf') as pdf:
+                for start in range(0, pdf.page_count, PAGE_TILE_SIZE):
+                    pages.extend(_extract_page_tile(pdf, start, min(start + PAGE_TILE_SIZE, pdf.page_count)))
+            
+            return [page_data for page_data in pages if page_data]
+        except Exception as e:
+            logger.warning(f"PyMuPDF failed, trying pdfplumber: {e}")
+            text_content = []
+        
+        try:
+            # Fallback to pdfplumber (better formatting preservation)
+            from pdfplumber import PDF
+            
+            with PDF.open(io.BytesIO(pdf_bytes)) as pdf:
                 for page_num, page in enumerate(pdf.pages, 1):
-                    page_text = page.extract_text()
+                    if len(page.chars) < FIGURE_PAGE_MAX_CHARS and \
+                            len(page.lines) + len(page.rects) + len(page.curves) > FIGURE_PAGE_MIN_SHAPES:
+                        text_content.append(_figure_page(page_num))
+                        continue
+                    
+                    page_text = page.extract_text(use_text_flow=True)
                     if page_text:
+                        # Table detection needs ruling lines, so skip it on pages that have none
+                        if page.lines or page.rects or page.curves:
+                            tables = page.extract_tables(table_settings=PDFPLUMBER_TABLE_SETTINGS)
+                        else:
+                            tables = []
+                        
                         text_content.append({
                             'page': page_num,
                             'text': page_text,
-                            'tables': page.extract_tables()
+                            'tables': tables
                         })
         except Exception as e:
             logger.warning(f"pdfplumber failed, trying PyPDF2: {e}")
+            text_content = []
             
             # Fallback to PyPDF2
             try:
-                with open(pdf_path, 'rb') as file:
-                    pdf_reader = PyPDF2.PdfReader(file)
-                    for page_num in range(len(pdf_reader.pages)):
-                        page = pdf_reader.pages[page_num]
-                        text = page.extract_text()
-                        text_content.append({
-                            'page': page_num + 1,
-                            'text': text,
-                            'tables': []
-                        })
+                import PyPDF2
+                
+                pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+                for page_num in range(len(pdf_reader.pages)):
+                    page = pdf_reader.pages[page_num]
+                    text = page.extract_text()
+                    text_content.append({
+                        'page': page_num + 1,
+                        'text': text,
+                        'tables': []
+                    })
             except Exception as e:
                 logger.error(f"Failed to extract text from PDF: {e}")
                 raise
@@ -79,92 +545,156 @@ class PDFToDocConverter:
         return text_content
     
     @staticmethod
-    def create_doc_from_text(text_content, output_path):
-        """Create DOC file from extracted text"""
-        doc = Document()
+    def create_doc_from_text(text_content):
+        """Create DOC file contents from extracted text"""
+        docx_buffer = io.BytesIO()
+        with StreamingDocxWriter(docx_buffer) as writer:
+            # Add document title
+            writer.add_title('Converted from PDF')
+            
+            for page_data in text_content:
+                # Add page separator
+                if page_data['page'] > 1:
+                    writer.add_page_break()
+                
+                # Add page header
+                writer.add_paragraph(
+                    f"Page {page_data['page']}",
+                    alignment='center',
+                    run_properties=_PAGE_HEADER_RUN_PROPERTIES
+                )
+                
+                # Add tables if present
+                if page_data['tables']:
+                    for table_data in page_data['tables']:
+                        if table_data and len(table_data) > 0 and len(table_data[0]) > 0:
+                            writer.add_table(table_data)
+                            writer.add_paragraph()  # Add spacing after table
+                
+                # Add text content
+                if page_data['text']:
+                    for para_text in _clean_paragraphs(page_data['text']):
+                        writer.add_paragraph(para_text, alignment='both')
         
-        # Add document title
-        doc.add_heading('Converted from PDF', 0)
+        docx_bytes = docx_buffer.getvalue()
         
-        for page_data in text_content:
-            # Add page separator
-            if page_data['page'] > 1:
-                doc.add_page_break()
-            
-            # Add page header
-            page_header = doc.add_paragraph(f"Page {page_data['page']}")
-            page_header.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            page_header.runs[0].font.bold = True
-            page_header.runs[0].font.size = Pt(10)
-            page_header.runs[0].font.color.rgb = RGBColor(128, 128, 128)
-            
-            # Add tables if present
-            if page_data['tables']:
-                for table_data in page_data['tables']:
-                    if table_data and len(table_data) > 0:
-                        table = doc.add_table(rows=len(table_data), cols=len(table_data[0]))
-                        table.style = 'Table Grid'
-                        
-                        for i, row_data in enumerate(table_data):
-                            for j, cell_data in enumerate(row_data):
-                                if cell_data:
-                                    table.rows[i].cells[j].text = str(cell_data)
-                        
-                        doc.add_paragraph()  # Add spacing after table
-            
-            # Add text content
-            if page_data['text']:
-                # Split text into paragraphs
-                paragraphs = page_data['text'].split('\n\n')
-                for para_text in paragraphs:
-                    if para_text.strip():
-                        para = doc.add_paragraph(para_text.strip())
-                        para.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-        
-        # Save as DOCX first
-        docx_path = output_path.replace('.doc', '.docx')
-        doc.save(docx_path)
-        
-        # Convert DOCX to DOC using LibreOffice (if available)
-        if shutil.which('libreoffice') or shutil.which('soffice'):
+        # Word opens DOCX content saved under a .doc name, so skip LibreOffice
+        # unless a real Word 97-2003 binary file is required
+        if not USE_LEGACY_DOC:
+            return docx_bytes
+        
+        # Convert DOCX to DOC through the running LibreOffice server (if it is accepting connections)
+        if UnoClient and LibreOfficeServer.is_accepting():
             try:
-                cmd = 'libreoffice' if shutil.which('libreoffice') else 'soffice'
-                subprocess.run([
-                    cmd, '--headless', '--convert-to', 'doc',
-                    '--outdir', os.path.dirname(output_path),
-                    docx_path
-                ], check=True, capture_output=True)
-                os.remove(docx_path)  # Remove temporary DOCX file
-                return output_path
+                return UnoClient(port=str(UNOSERVER_PORT)).convert(
+                    indata=docx_bytes, convert_to='doc'
+                )
+            except Exception as e:
+                logger.warning(f"LibreOffice server conversion failed: {e}")
+        
+        # Otherwise start LibreOffice for this conversion (if available)
+        if LIBREOFFICE_CMD:
+            try:
+                with tempfile.TemporaryDirectory() as temp_dir:
+                    docx_path = os.path.join(temp_dir, 'converted.docx')
+                    with open(docx_path, 'wb') as docx_file:
+                        docx_file.write(docx_bytes)
+                    subprocess.run([
+                        LIBREOFFICE_CMD, '--headless', '--convert-to', 'doc',
+                        '--outdir', temp_dir,
+                        docx_path
+                    ], check=True, capture_output=True)
+                    with open(os.path.join(temp_dir, 'converted.doc'), 'rb') as doc_file:
+                        return doc_file.read()
             except Exception as e:
                 logger.warning(f"LibreOffice conversion failed: {e}")
         
-        # If LibreOffice not available, rename DOCX to DOC
+        # If LibreOffice not available, send the DOCX content as DOC
         # (Most modern Word versions can open it)
-        os.rename(docx_path, output_path)
-        return output_path
+        return docx_bytes
     
     @staticmethod
-    def convert_pdf_to_doc(pdf_path, output_path):
-        """Main conversion function"""
+    def convert_pdf_to_doc(pdf_bytes):
+        """Main conversion function, returns the DOC file contents"""
         try:
             # Extract text from PDF
-            text_content = PDFToDocConverter.extract_text_from_pdf(pdf_path)
+            text_content = PDFToDocConverter.extract_text_from_pdf(pdf_bytes)
             
             if not text_content:
                 raise ValueError("No text content could be extracted from PDF")
             
             # Create DOC from extracted text
-            doc_path = PDFToDocConverter.create_doc_from_text(text_content, output_path)
-            
-            return doc_path
+            return PDFToDocConverter.create_doc_from_text(text_content)
         except Exception as e:
             logger.error(f"Conversion failed: {e}")
             raise
 
-async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Send a welcome message when the command /start is issued."""
-    welcome_text = """
+def _create_convert_pool():
+    """Create the conversion pool
+    
+    Workers are started by forkserver (or spawn) rather than forked from the
+    running, multi-threaded bot process.
+    """
+    start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return ProcessPoolExecutor(
+        max_workers=CONVERT_WORKERS,
+        mp_context=multiprocessing.get_context(start_method)
+    )
+
+async def _run_in_pool(func, *args):
+    """Run func in CONVERT_POOL, replacing the pool and retrying once if a worker died"""
+    global CONVERT_POOL
+    loop = asyncio.get_running_loop()
+    pool = CONVERT_POOL
+    try:
+        return await loop.run_in_executor(pool, func, *args)
+    except BrokenProcessPool:
+        # Only the first task to notice replaces the pool
+        if CONVERT_POOL is pool:
+            logger.warning("A conversion worker died, restarting the conversion pool")
+            CONVERT_POOL = _create_convert_pool()
+            pool.shutdown(wait=False)
+        return await loop.run_in_executor(CONVERT_POOL, func, *args)
+
+async def convert_in_pool(pdf_bytes):
+    """Convert a PDF in CONVERT_POOL, returning the DOC file contents
+    
+    Large PDFs are split into page ranges that are extracted on all of the
+    pool's workers at once; the DOCX is built once they are all back. Every
+    conversion shares the same pool, so concurrent uploads never run more
+    than CONVERT_WORKERS processes.
+    """
+    text_content = None
+    
+    try:
+        page_count = await _run_in_pool(PDFToDocConverter.count_pages, pdf_bytes)
+        if page_count >= PARALLEL_PAGE_THRESHOLD:
+            span = -(-page_count // CONVERT_WORKERS)
+            ranges = await asyncio.gather(*(
+                _run_in_pool(
+                    PDFToDocConverter.extract_page_range,
+                    pdf_bytes, start, min(start + span, page_count)
+                )
+                for start in range(0, page_count, span)
+            ))
+            text_content = [page_data for pages in ranges for page_data in pages if page_data]
+    except BrokenProcessPool:
+        # The PDF crashed a worker even after a retry; don't feed it to the pool again
+        raise
+    except Exception as e:
+        logger.warning(f"Parallel PyMuPDF extraction failed, using serial conversion: {e}")
+    
+    # Small PDFs (and failures above) go through the serial pipeline with all fallbacks
+    if text_content is None:
+        return await _run_in_pool(PDFToDocConverter.convert_pdf_to_doc, pdf_bytes)
+    
+    if not text_content:
+        raise ValueError("No text content could be extracted from PDF")
+    
+    return await _run_in_pool(PDFToDocConverter.create_doc_from_text, text_content)
+
+# Command replies
+_WELCOME_TEXT = """
 📄 *PDF to DOC Converter Bot* 📄
 
 Welcome! I can convert your PDF files to Microsoft Word DOC format.
@@ -187,11 +717,8 @@ Welcome! I can convert your PDF files to Microsoft Word DOC format.
 
 Just send me a PDF file to get started!
 """
-    await update.message.reply_text(welcome_text, parse_mode='Markdown')
 
-async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Send a help message when the command /help is issued."""
-    help_text = """
+_HELP_TEXT = """
 🤖 *PDF to DOC Converter Help*
 
 *Commands:*
@@ -224,11 +751,13 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 Need help? Contact @YourUsername
 """
-    await update.message.reply_text(help_text, parse_mode='Markdown')
 
-async def about_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Send information about the bot"""
-    about_text = """
+if CACHE_MAX_AGE > 0:
+    _CACHE_PRIVACY_NOTE = f"• Converted files are cached for up to {CACHE_MAX_AGE / 3600:g} hours, then deleted"
+else:
+    _CACHE_PRIVACY_NOTE = "• Converted files are not stored"
+
+_ABOUT_TEXT = f"""
 ℹ️ *About PDF to DOC Bot*
 
 Version: 1.0.0
@@ -238,12 +767,12 @@ This bot converts PDF files to Microsoft Word DOC format (97-2003).
 
 *Technical Details:*
 • Language: Python 3
-• Libraries: PyPDF2, pdfplumber, python-docx
+• Libraries: PyMuPDF, PyPDF2, pdfplumber, python-docx
 • Format: DOC (Word 97-2003)
 
 *Privacy:*
-• Files are deleted after conversion
-• No data is stored permanently
+• Uploaded PDFs are processed in memory and never written to disk
+{_CACHE_PRIVACY_NOTE}
 • Secure processing
 
 *Source Code:*
@@ -252,7 +781,18 @@ Available on GitHub
 *Support:*
 Contact @YourUsername for help
 """
-    await update.message.reply_text(about_text, parse_mode='Markdown')
+
+async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Send a welcome message when the command /start is issued."""
+    await update.message.reply_text(_WELCOME_TEXT, parse_mode=ParseMode.MARKDOWN)
+
+async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Send a help message when the command /help is issued."""
+    await update.message.reply_text(_HELP_TEXT, parse_mode=ParseMode.MARKDOWN)
+
+async def about_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Send information about the bot"""
+    await update.message.reply_text(_ABOUT_TEXT, parse_mode=ParseMode.MARKDOWN)
 
 async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show user statistics"""
@@ -272,7 +812,7 @@ Total Data Processed: *{total_size / (1024*1024):.2f} MB*
 
 Thank you for using PDF to DOC Bot!
 """
-    await update.message.reply_text(stats_text, parse_mode='Markdown')
+    await update.message.reply_text(stats_text, parse_mode=ParseMode.MARKDOWN)
 
 async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle incoming documents"""
@@ -309,79 +849,89 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
             f"📄 File: {file_name}\n"
             f"📊 Size: {document.file_size / 1024:.2f} KB\n\n"
             "Please wait...",
-            parse_mode='Markdown'
+            parse_mode=ParseMode.MARKDOWN
         )
         
-        # Download the file
+        # Download the file straight into memory
         file = await document.get_file()
+        pdf_bytes = bytes(await file.download_as_bytearray())
         
-        # Create temporary directory
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Download PDF
-            pdf_path = os.path.join(temp_dir, file_name)
-            await file.download_to_drive(pdf_path)
+        # Update processing message
+        await processing_msg.edit_text(
+            "⚙️ *Converting to DOC format...*\n\n"
+            "This may take a moment for large files.",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        
+        # Convert PDF to DOC
+        output_filename = file_name.replace('.pdf', '.doc').replace('.PDF', '.doc')
+        
+        try:
+            # Reuse a previous conversion of the same PDF
+            pdf_hash = await asyncio.to_thread(lambda: hashlib.sha256(pdf_bytes).hexdigest())
+            doc_bytes = await asyncio.to_thread(CONVERSION_CACHE.get, pdf_hash)
+            cache_hit = bool(doc_bytes)  # An empty entry is a miss and gets rewritten
             
-            # Update processing message
+            if cache_hit:
+                logger.info(f"Cache hit for {file_name} ({pdf_hash})")
+            else:
+                LIBREOFFICE_SERVER.ensure_running()
+                
+                # Run the CPU-bound conversion in worker processes. Small PDFs go
+                # there too: PyMuPDF is not thread-safe, and the pool is warm
+                doc_bytes = await convert_in_pool(pdf_bytes)
+        except Exception as e:
             await processing_msg.edit_text(
-                "⚙️ *Converting to DOC format...*\n\n"
-                "This may take a moment for large files.",
-                parse_mode='Markdown'
+                f"❌ *Conversion failed!*\n\n"
+                f"Error: {str(e)}\n\n"
+                "This might be a scanned PDF or have complex formatting.\n"
+                "Try with a different PDF file.",
+                parse_mode=ParseMode.MARKDOWN
             )
-            
-            # Convert PDF to DOC
-            output_filename = file_name.replace('.pdf', '.doc').replace('.PDF', '.doc')
-            output_path = os.path.join(temp_dir, output_filename)
-            
-            try:
-                PDFToDocConverter.convert_pdf_to_doc(pdf_path, output_path)
-            except Exception as e:
-                await processing_msg.edit_text(
-                    f"❌ *Conversion failed!*\n\n"
-                    f"Error: {str(e)}\n\n"
-                    "This might be a scanned PDF or have complex formatting.\n"
-                    "Try with a different PDF file.",
-                    parse_mode='Markdown'
-                )
-                return
-            
-            # Check if output file was created
-            if not os.path.exists(output_path):
-                await processing_msg.edit_text(
-                    "❌ Failed to create DOC file.\n"
-                    "Please try again or contact support."
-                )
-                return
-            
-            # Send the converted file
+            return
+        
+        # Check if output file was created
+        if not doc_bytes:
             await processing_msg.edit_text(
+                "❌ Failed to create DOC file.\n"
+                "Please try again or contact support."
+            )
+            return
+        
+        # Send the converted file right away; the status update and
+        # cache write run alongside the upload
+        pending = [
+            processing_msg.edit_text(
                 "📤 *Uploading your DOC file...*",
-                parse_mode='Markdown'
+                parse_mode=ParseMode.MARKDOWN
+            ),
+            update.message.reply_document(
+                document=io.BytesIO(doc_bytes),
+                filename=output_filename,
+                caption=(
+                    f"✅ *Conversion Complete!*\n\n"
+                    f"📄 Original: {file_name}\n"
+                    f"📝 Converted: {output_filename}\n"
+                    f"📊 Size: {len(doc_bytes) / 1024:.2f} KB\n\n"
+                    "Enjoy your DOC file!"
+                ),
+                parse_mode=ParseMode.MARKDOWN
             )
-            
-            with open(output_path, 'rb') as doc_file:
-                await update.message.reply_document(
-                    document=doc_file,
-                    filename=output_filename,
-                    caption=(
-                        f"✅ *Conversion Complete!*\n\n"
-                        f"📄 Original: {file_name}\n"
-                        f"📝 Converted: {output_filename}\n"
-                        f"📊 Size: {os.path.getsize(output_path) / 1024:.2f} KB\n\n"
-                        "Enjoy your DOC file!"
-                    ),
-                    parse_mode='Markdown'
-                )
-            
-            # Delete processing message
-            await processing_msg.delete()
-            
-            # Update user statistics
-            user_data = context.user_data
-            user_data['conversions'] = user_data.get('conversions', 0) + 1
-            user_data['total_size'] = user_data.get('total_size', 0) + document.file_size
-            
-            logger.info(f"Successfully converted {file_name} for user {update.effective_user.id}")
-            
+        ]
+        if not cache_hit:
+            pending.append(asyncio.to_thread(CONVERSION_CACHE.put, pdf_hash, doc_bytes))
+        await asyncio.gather(*pending)
+        
+        # Delete processing message
+        await processing_msg.delete()
+        
+        # Update user statistics
+        user_data = context.user_data
+        user_data['conversions'] = user_data.get('conversions', 0) + 1
+        user_data['total_size'] = user_data.get('total_size', 0) + document.file_size
+        
+        logger.info(f"Successfully converted {file_name} for user {update.effective_user.id}")
+        
     except Exception as e:
         logger.error(f"Error handling document: {e}")
         await update.message.reply_text(
@@ -408,6 +958,12 @@ async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 def main():
     """Start the bot"""
+    global CONVERT_POOL
+    CONVERT_POOL = _create_convert_pool()
+    CONVERSION_CACHE.evict()  # Drop entries that expired while the bot was down
+    if USE_LEGACY_DOC:
+        LIBREOFFICE_SERVER.start()
+    
     # Create application
     application = Application.builder().token(BOT_TOKEN).build()
     
@@ -431,7 +987,11 @@ def main():
     print("🤖 PDF to DOC Bot is starting...")
     print("Press Ctrl+C to stop")
     
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    try:
+        application.run_polling(allowed_updates=Update.ALL_TYPES)
+    finally:
+        CONVERT_POOL.shutdown()
+        LIBREOFFICE_SERVER.stop()
 
 if __name__ == '__main__':
     main()